@@ -11,81 +11,128 @@
 
 #define INITIAL_LINE_BUFFER_SIZE 2048
 #define INITIAL_LINES_CONTAINER_SIZE 4096
-#define INITIAL_COLUMNS_CONTAINER_SIZE 1024
+#define OUTPUT_BUFFER_SIZE 65536
+#define DASHES_BLOCK_SIZE 128
 
 #define INPUT stdin
+#define UTF8_BOM "\xEF\xBB\xBF"
+
+static const char dashesBlock[DASHES_BLOCK_SIZE + 1] =
+  "----------------------------------------------------------------"
+  "----------------------------------------------------------------";
 
 
 struct columnDescription {
-  char             name[129];
+  const char      *name;         // points to the header line, not terminated
   unsigned short   nameLength;
-  char             printFormat[64];
+  size_t           printWidth;
+  size_t           printPrecision;
+  char             rightJustified;
+  char             separator;
   size_t           offset;
   size_t           length;
+  size_t           end;          // offset + length, i.e. delimiter position
   long             leftPad;
   long             rightPad;
 };
 
 
 /*************************************************************
- * Get line from input
- *
+ * Read line from input and put it into the buffer at specified
+ * position. Buffer is allocated on the first call and grown as
+ * necessary, it's owned (and freed) by the caller.
+ * Returns line length or -1 (EOF or error).
  *************************************************************/
-char* getLine (FILE * f) {
-  char * buff, * _buff;
+long appendLine (FILE * f, char ** buff, size_t * buff_size, size_t position) {
+  char * _buff;
   char * str_ptr;
   size_t str_length, processed_length;
-  size_t buff_size;
 
 
-  buff_size        = INITIAL_LINE_BUFFER_SIZE;
-  processed_length = 0;
-  buff             = NULL;
+  processed_length = position;
+
+  if (*buff == NULL) {
+    if ( (*buff = malloc(INITIAL_LINE_BUFFER_SIZE)) == NULL ) {
+      fprintf(stderr, "Not enough memory or memory allocation error\nPartial input processing\n");
+
+      return -1;
+    }
+    *buff_size = INITIAL_LINE_BUFFER_SIZE;
+  }
 
 
   while (1) {
-    if ( (_buff = realloc(buff, buff_size)) == NULL  ||  errno == ENOMEM ) {
-      fprintf(stderr, "Not enough memory or memory allocation error\nPartial input processing\n");
-      free(buff);
+    // Reserve space for at least one char and string terminator
+    if (*buff_size - processed_length < 2) {
+      if ( (_buff = realloc(*buff, *buff_size * 2)) == NULL ) {
+        fprintf(stderr, "Not enough memory or memory allocation error\nPartial input processing\n");
 
-      return NULL;
+        return -1;
+      }
+      *buff       = _buff;
+      *buff_size *= 2;
     }
-    buff = _buff;
 
     //  set pointer to the new string  section
-    str_ptr = buff + processed_length;
+    str_ptr = *buff + processed_length;
 
     // Get string and check if there was any error
-    if (fgets (str_ptr, buff_size - processed_length, f) == NULL) {
+    if (fgets (str_ptr, *buff_size - processed_length, f) == NULL) {
       if (!feof(f)) {
         // Input error
         fprintf(stderr, "Input read error\nPartial input processing\n");
-        free(buff);
 
-        return NULL;
-      } else if (processed_length == 0) {
+        return -1;
+      } else if (processed_length == position) {
         // EOF at the beginning of new line
-        free(buff);
-
-        return NULL;
-      } else {
-        // EOF at the start of new buffer section
-        return buff;
+        return -1;
       }
-    } else {
-      str_length = strlen(str_ptr);
 
-      if (str_ptr[str_length - 1] == '\n') {
-        // End Of Line, string reading is done.
-        str_ptr[str_length - 1] = 0;
+      // EOF at the start of new buffer section
+      break;
+    }
 
-        return buff;
-      } else {
-        processed_length += str_length;
-        buff_size *= 2;
-      }
+    str_length        = strlen(str_ptr);
+    processed_length += str_length;
+
+    if (str_ptr[str_length - 1] == '\n') {
+      // End Of Line, string reading is done.
+      processed_length--;
+      break;
     }
   }
+
+  // Line ending is removed in the same pass, including CR of CRLF
+  if (processed_length > position  &&  (*buff)[processed_length - 1] == '\r')
+    processed_length--;
+
+  (*buff)[processed_length] = 0;
+
+  return processed_length - position;
+}
+
+
+/*************************************************************
+ * Read line from input into reusable buffer.
+ * Buffer is allocated on the first call and grown as necessary,
+ * it's owned (and freed) by the caller.
+ *************************************************************/
+char* readLine (FILE * f, char ** buff, size_t * buff_size) {
+  if (appendLine(f, buff, buff_size, 0) < 0) {
+    return NULL;
+  }
+
+  return *buff;
+}
+
+
+/*************************************************************
+ * Print line as is.
+ * Doesn't parse format string unlike printf("%s\n", line).
+ *************************************************************/
+static inline void print_line(char *line) {
+  fputs(line, stdout);
+  putchar('\n');
 }
 
 
@@ -95,39 +142,55 @@ char* getLine (FILE * f) {
  *************************************************************/
 void flushIrrelevantLines() {
   char * line;
+  char * buff      = NULL;
+  size_t buff_size = 0;
+  long   lineCount;
 
-  while ((line = getLine(INPUT)) != NULL) {
-    printf("%s\n", line);
+  for (lineCount = 0; (line = readLine(INPUT, &buff, &buff_size)) != NULL; lineCount++) {
+    // Skip UTF-8 byte order mark at the beginning of input
+    if (lineCount == 0  &&  strncmp(line, UTF8_BOM, 3) == 0)
+      line += 3;
+
+    print_line(line);
 
     if (line[0] == 0) {
-      free(line);
-      return;
+      break;
     }
-
-    free(line);
   }
+
+  free(buff);
 }
 
 
 /*************************************************************
  * Load input
- *
+ * All lines are stored one by one in a single buffer, which
+ * starts with the first line. So free(inputLines[0]) releases
+ * all of them.
  *************************************************************/
 char **getInput(int sample_size) {
   char **inputLines, **_inputLines;
+  char  *inputBuffer;
+  size_t inputBufferSize, inputBufferUsed;
+  long   lineLength = 0;
   unsigned long input_buffer_size;
   unsigned long lines, count;
 
   inputLines        = NULL;
+  inputBuffer       = NULL;
+  inputBufferSize   = 0;
+  inputBufferUsed   = 0;
   input_buffer_size = INITIAL_LINES_CONTAINER_SIZE;
   lines             = 0;
 
+  // Don't reserve more than necessary if sample is small
+  if (sample_size >= 0  &&  sample_size + 1 < INITIAL_LINES_CONTAINER_SIZE)
+    input_buffer_size = sample_size + 1;
+
   while (1) {
     // Allocate/reallocate memory
     if ( (_inputLines = realloc(inputLines, input_buffer_size*(sizeof(char *)))) == NULL  ||  errno == ENOMEM ) {
-      for (count = 0; count < lines; count++)
-        free(inputLines[ count ]);
-
+      free (inputBuffer);
       free (inputLines);
       fprintf(stderr, "Not enough memory or memory allocation error\n");
 
@@ -136,21 +199,34 @@ char **getInput(int sample_size) {
     inputLines = _inputLines;
 
     while ( lines < input_buffer_size - 1  &&  (( lines < sample_size) || (sample_size == -1)) ) {
-      if ((inputLines[lines] = getLine(INPUT)) == NULL) {
+      if ((lineLength = appendLine(INPUT, &inputBuffer, &inputBufferSize, inputBufferUsed)) < 0) {
         // End of input
-        return inputLines;
+        break;
       }
 
+      inputBufferUsed += lineLength + 1;
       lines++;
     }
 
-    if (lines == sample_size) {
-      inputLines[lines] = NULL; // End of input marker
-      return inputLines;
+    if (lineLength < 0  ||  lines == sample_size) {
+      break;
     }
 
     input_buffer_size *= 2;
   }
+
+  if (lines == 0) {
+    free(inputBuffer);
+  }
+
+  // Buffer could be moved while growing, so line pointers are set at the end
+  for (count = 0; count < lines; count++) {
+    inputLines[count] = inputBuffer;
+    inputBuffer      += strlen(inputBuffer) + 1;
+  }
+  inputLines[lines] = NULL; // End of input marker
+
+  return inputLines;
 }
 
 
@@ -161,17 +237,20 @@ char **getInput(int sample_size) {
  *************************************************************/
 void flushLines(char **lines) {
   char * line;
+  char * buff      = NULL;
+  size_t buff_size = 0;
 
   for (unsigned long count = 0; lines[count] != NULL; count++) {
-    printf("%s\n", lines[count]);
-    free(lines[count]);
+    print_line(lines[count]);
   }
+  free(lines[0]);
   free(lines);
 
-  while ((line = getLine(INPUT)) != NULL) {
-    printf("%s\n", line);
-    free(line);
+  while ((line = readLine(INPUT, &buff, &buff_size)) != NULL) {
+    print_line(line);
   }
+
+  free(buff);
 }
 
 
@@ -180,13 +259,26 @@ void flushLines(char **lines) {
  *
  *************************************************************/
 struct columnDescription *parse_header(char *lineNames, char *lineDelimiters) {
-  int columns_buffer_size = INITIAL_COLUMNS_CONTAINER_SIZE;
-  struct columnDescription *columnsContainer, *_tempColumnsContainer;
+  struct columnDescription *columnsContainer;
+  char *delimiter;
   long columns, count;
 
-  // Allocate memory
-  if ( (columnsContainer = malloc(columns_buffer_size*sizeof(struct columnDescription))) == NULL ) {
-    fprintf(stderr, "Not enough memory or memory allocation error whileprocessing resultset header\nInitial allocation\n");
+  // Delimiters line must start with '-' (zero-length first column otherwise)
+  // and may contain only '-' and ' ' characters.
+  // Check the first char, then the whole line with a single strspn() scan
+  // before any allocation is done.
+  if (lineDelimiters[0] != '-'  ||  lineDelimiters[ strspn(lineDelimiters, "- ") ] != 0) {
+    return NULL;
+  }
+
+  // Count columns (number of column breaks + 1) to allocate container of exact size
+  columns = 1;
+  for (delimiter = strchr(lineDelimiters, ' '); delimiter != NULL; delimiter = strchr(delimiter + 1, ' '))
+    columns++;
+
+  // Allocate memory (+1 for the end of columns marker)
+  if ( (columnsContainer = malloc((columns + 1)*sizeof(struct columnDescription))) == NULL ) {
+    fprintf(stderr, "Not enough memory or memory allocation error while processing resultset header\n");
     return NULL;
   }
 
@@ -199,40 +291,24 @@ struct columnDescription *parse_header(char *lineNames, char *lineDelimiters) {
   columnsContainer[columns].leftPad   = -1;
   columnsContainer[columns].rightPad  = -1;
 
-  for (count = 0; lineDelimiters[count] != 0; count++) {
-    switch (lineDelimiters[count]) {
-      case '-':
-        // Next char of the current column. Do nothing
-        break;
-
-      case ' ':
-        // Column break. Collect column info and skip whitespace.
-        columnsContainer[columns].length   = count - columnsContainer[columns].offset;
+  count = 0;
 
-        columns++;
+  while (1) {
+    // Skip the whole run of '-' chars of the current column with one strspn() call
+    count += strspn(lineDelimiters + count, "-");
 
-        // Check if it's necessary to reserve additional space for columns description container
-        if (columns + 1 >= columns_buffer_size) {
-          columns_buffer_size *= 2;
+    if (lineDelimiters[count] == 0)
+      break;
 
-          if ( (_tempColumnsContainer = realloc( columnsContainer, columns_buffer_size*sizeof(struct columnDescription) )) == NULL ) {
-            fprintf(stderr, "Not enough memory or memory allocation error while processing resultset header\nReallocation\n");
-            free(columnsContainer);
-            return NULL;
-          }
-          columnsContainer = _tempColumnsContainer;
-        }
+    // Column break. Collect column info and skip whitespace.
+    columnsContainer[columns].length   = count - columnsContainer[columns].offset;
 
-        columnsContainer[columns].offset   = count + 1;
-        columnsContainer[columns].leftPad  = -1;
-        columnsContainer[columns].rightPad = -1;
-        break;
+    columns++;
+    count++;
 
-      default:
-        // Non-expected symbol. Stop processing
-        free(columnsContainer);
-        return NULL;
-    }
+    columnsContainer[columns].offset   = count;
+    columnsContainer[columns].leftPad  = -1;
+    columnsContainer[columns].rightPad = -1;
   }
 
   columnsContainer[columns].length     = count - columnsContainer[columns].offset;
@@ -251,25 +327,18 @@ struct columnDescription *parse_header(char *lineNames, char *lineDelimiters) {
       return NULL;
     }
 
+    // Delimiter position is precomputed once, rows are checked against it
+    columnsContainer[count].end = columnsContainer[count].offset + columnsContainer[count].length;
+
+    // Name isn't copied, it's referenced in the header line and printed with
+    // precision limited by name length. Header line is kept until header is printed.
     // 128 is a limit of column name length in DB2 UDB
-    // Nevertheless, let's check it since space for name is limited by 129 characters
+    columnsContainer[count].name       = lineNames + columnsContainer[count].offset;
     columnsContainer[count].nameLength = (columnsContainer[count].length < 128)? columnsContainer[count].length : 128;
 
-    strncpy(
-      columnsContainer[count].name
-     ,lineNames + columnsContainer[count].offset
-     ,columnsContainer[count].nameLength
-    );
-    columnsContainer[count].name[ columnsContainer[count].nameLength ] = 0;
-
     // Remove trailing spaces from column name
-    for (short charCounter = columnsContainer[count].nameLength - 1; charCounter >= 0; charCounter--) {
-      if (columnsContainer[count].name[charCounter] == ' ') {
-        columnsContainer[count].name[charCounter] = 0;
-        columnsContainer[count].nameLength--;
-      } else {
-        break;
-      }
+    while (columnsContainer[count].nameLength > 0  &&  columnsContainer[count].name[ columnsContainer[count].nameLength - 1 ] == ' ') {
+      columnsContainer[count].nameLength--;
     }
 
     // Check that column has correct name
@@ -291,18 +360,20 @@ struct columnDescription *parse_header(char *lineNames, char *lineDelimiters) {
  * -1 - non-DB2 output
  *
  *************************************************************/
-int is_valid_row(struct columnDescription *columns, char* line, int state) {
-  size_t length;
-  long   count, offset;
+static inline int is_valid_row(struct columnDescription *columns, char* line, int state) {
+  size_t position, end;
+  long   count;
 
   if (state == -1)  return -1;
 
-  length = strlen(line);
+  // Line end is looked for only up to the current delimiter (instead of strlen()
+  // of the whole line), so non-row lines are rejected at the first wrong delimiter.
+  position = 0;
 
   for (count = 0; columns[count].length != -1; count++) {
-    offset = columns[count].offset + columns[count].length;
+    end = columns[count].end;
 
-    if ( offset > length  ||  (line[offset] != ' ' && line[offset] != 0) ) {
+    if ( memchr(line + position, 0, end - position) != NULL  ||  (line[end] != ' ' && line[end] != 0) ) {
       if (state == 1  ||  strncmp(line, "SQL", 3) == 0) {
         // SQL error or warning
         return 1;
@@ -310,6 +381,8 @@ int is_valid_row(struct columnDescription *columns, char* line, int state) {
         return -1;
       }
     }
+
+    position = end;
   }
 
   return 0;
@@ -317,17 +390,69 @@ int is_valid_row(struct columnDescription *columns, char* line, int state) {
 
 
 /*************************************************************
- * Print rowset line.
+ * Print dashes of specified length (header underline).
+ * Written with whole blocks instead of char by char.
+ *************************************************************/
+void print_dashes(size_t length) {
+  for ( ; length > DASHES_BLOCK_SIZE; length -= DASHES_BLOCK_SIZE) {
+    fwrite(dashesBlock, 1, DASHES_BLOCK_SIZE, stdout);
+  }
+  fwrite(dashesBlock, 1, length, stdout);
+}
+
+
+/*************************************************************
+ * Get length of formatted rowset line (including '\n').
  *
  *************************************************************/
-void print_row(struct columnDescription *columns, char *line) {
+size_t get_row_length(struct columnDescription *columns) {
+  size_t rowLength = 0;
   long count;
 
   for (count = 0; columns[count].length != -1; count++) {
-    printf(columns[count].printFormat, line + columns[count].offset);
+    rowLength += columns[count].printWidth + 1;
   }
 
-  free(line);
+  return rowLength;
+}
+
+
+/*************************************************************
+ * Print rowset line.
+ * Equivalent of printf("%-W.Ps ") / printf("%W.Ps ") with
+ * precomputed width and precision. Row is assembled with plain
+ * memcpy()/memset() in rowBuffer and written at once.
+ *************************************************************/
+static inline void print_row(struct columnDescription *columns, char *line, char *rowBuffer) {
+  struct columnDescription *column;
+  size_t valueLength, padLength;
+  char *rowPtr, *value, *valueEnd;
+  long count;
+
+  rowPtr = rowBuffer;
+
+  for (count = 0; columns[count].length != -1; count++) {
+    column      = &(columns[count]);
+    value       = line + column->offset;
+
+    // Value is limited by precision or by the end of line (ISO C strnlen())
+    valueEnd    = memchr(value, 0, column->printPrecision);
+    valueLength = (valueEnd != NULL) ? (size_t)(valueEnd - value) : column->printPrecision;
+    padLength   = column->printWidth - valueLength;
+
+    if (column->rightJustified) {
+      memset(rowPtr, ' ', padLength);
+      memcpy(rowPtr + padLength, value, valueLength);
+    } else {
+      memcpy(rowPtr, value, valueLength);
+      memset(rowPtr + valueLength, ' ', padLength);
+    }
+    rowPtr += column->printWidth;
+
+    *rowPtr++ = column->separator;
+  }
+
+  fwrite(rowBuffer, 1, rowPtr - rowBuffer, stdout);
 }
 
 
@@ -336,54 +461,74 @@ void print_row(struct columnDescription *columns, char *line) {
  *
  *************************************************************/
 int analyze_rowset(struct columnDescription *columns, char **lines) {
-  long count, columnCount;
-  long leftPad, rightPad;
-  size_t offset, length;
+  struct columnDescription *column;
+  char  *line, *value;
+  long   count;
+  long   leftPad, rightPad;
+  size_t length, end, lineLength;
 
 
   // Iterate through lines to get left/right padding info
-  for (count = 2; lines[count] != NULL; count++) {
+  for (count = 2; (line = lines[count]) != NULL; count++) {
     // Check if it's the end of result set. If yes, break
-    if (lines[count][0] == 0)
+    if (line[0] == 0)
       break;
 
-    switch (is_valid_row(columns, lines[count], 0)) {
-      case 1:
-        // SQL error or warning. Skip non-relevant lines up to empty line.
-        while (lines[count] != NULL  &&  lines[count][0] != 0) {
-          count++;
-        }
+    if (strncmp(line, "SQL", 3) == 0  &&  is_valid_row(columns, line, 0) == 1) {
+      // SQL error or warning. Skip non-relevant lines up to empty line.
+      while (lines[count] != NULL  &&  lines[count][0] != 0) {
+        count++;
+      }
 
-        // Go to next input line
-        continue;
+      // End of preloaded lines. Don't step over the end marker.
+      if (lines[count] == NULL)
+        break;
 
-      case -1:
-        return -1;
+      // Go to next input line
+      continue;
     }
 
-    for (columnCount = 0; columns[columnCount].length != -1; columnCount++) {
+    // Row check (see is_valid_row()) is fused with padding calculation,
+    // so each line is walked through only once.
+    lineLength = strlen(line);
+
+    // Current line and column are kept in locals, so the inner loop
+    // doesn't index lines[] and columns[] again and again.
+    for (column = columns; column->length != -1; column++) {
+      value   = line + column->offset;
+      length  = column->length;
+      end     = column->end;
+
+      // Check column delimiter. Non-DB2 output otherwise.
+      if ( end > lineLength  ||  (line[end] != ' ' && line[end] != 0) )
+        return -1;
+
+      // Both pads can't become less than zero. Column format is settled,
+      // so the rest of its values don't have to be scanned.
+      if (column->leftPad == 0  &&  column->rightPad == 0)
+        continue;
+
       // Get left pad
-      offset  = columns[columnCount].offset;
-      length  = columns[columnCount].length;
-      leftPad = 0;
-      while (lines[count][offset + leftPad] == ' ' && leftPad < length)
-         leftPad++;
+      // strspn() scans the whole run of spaces at once, limit it by column length
+      leftPad = strspn(value, " ");
+      if (leftPad > length)
+        leftPad = length;
 
-      if (leftPad == columns[columnCount].length)
+      if (leftPad == length)
         // Empty value. Don't take it into account.
         continue;
 
-      if (columns[columnCount].leftPad == -1 || columns[columnCount].leftPad > leftPad)
-        columns[columnCount].leftPad = leftPad;
+      if (column->leftPad == -1 || column->leftPad > leftPad)
+        column->leftPad = leftPad;
 
 
       // Get right pad
       rightPad = 0;
-      while (lines[count][offset + length - rightPad - 1] == ' '  &&  rightPad < length)
+      while (value[length - rightPad - 1] == ' '  &&  rightPad < length)
         rightPad++;
 
-      if (columns[columnCount].rightPad == -1  ||  columns[columnCount].rightPad > rightPad)
-        columns[columnCount].rightPad = rightPad;
+      if (column->rightPad == -1  ||  column->rightPad > rightPad)
+        column->rightPad = rightPad;
     }
   }
 
@@ -393,67 +538,69 @@ int analyze_rowset(struct columnDescription *columns, char **lines) {
 
 /**********************************************************************************
  * Process header
- *
+ * Prepare output format of columns. Nothing is printed yet.
  **********************************************************************************/
 void process_header(struct columnDescription *columns) {
   struct columnDescription *column;
-  char headerPrintFormat[64];
-  long count, columnCount;
 
-  // Column names
-  for (count = 0; columns[count].length != -1; count++) {
-    column    = &(columns[count]);
+  for (column = columns; column->length != -1; column++) {
+    // Last column check is evaluated once per column
+    column->separator = ((column + 1)->length == -1) ? '\n' : ' ';
 
     if (column->leftPad == -1) {
       // Empty column
       column->length = column->nameLength;
 
-      snprintf(headerPrintFormat,   64, (columns[count+1].length == -1) ? "%%-%d.%ds\n" : "%%-%d.%ds ", column->nameLength, column->nameLength);
-      snprintf(column->printFormat, 64, (columns[count+1].length == -1) ? "%%-%d.%ds\n" : "%%-%d.%ds ", column->nameLength, column->nameLength);
+      column->printWidth     = column->nameLength;
+      column->printPrecision = column->nameLength;
+      column->rightJustified = 0;
 
     } else if (column->nameLength <= column->length - (column->leftPad + column->rightPad) ) {
       // Value is longer or equal than column name
       column->offset += column->leftPad;
       column->length -= (column->leftPad + column->rightPad);
 
-      snprintf(headerPrintFormat,   64, (columns[count+1].length == -1) ? "%%-%d.%ds\n" : "%%-%d.%ds ", column->length, column->nameLength);
-      snprintf(column->printFormat, 64, (columns[count+1].length == -1) ? "%%-%d.%ds\n" : "%%-%d.%ds ", column->length, column->length);
+      column->printWidth     = column->length;
+      column->printPrecision = column->length;
+      column->rightJustified = 0;
 
     } else {
       // Name is longer than column values
       column->offset += column->leftPad;
       column->length -= (column->leftPad + column->rightPad);
 
-      if (column->leftPad <= column->rightPad) {
-        // Left padded column
-        snprintf(column->printFormat, 64, (columns[count+1].length == -1) ? "%%-%d.%ds\n" : "%%-%d.%ds ", column->nameLength, column->length);
-      } else {
-        // Special case, values are right justified
-        snprintf(column->printFormat, 64, (columns[count+1].length == -1) ? "%%%d.%ds\n"  : "%%%d.%ds ",  column->nameLength, column->length);
-      }
+      column->printWidth     = column->nameLength;
+      column->printPrecision = column->length;
 
-      sprintf(headerPrintFormat, (columns[count+1].length == -1) ? "%%-%d.%ds\n" : "%%-%d.%ds ", column->nameLength, column->nameLength);
+      // Left padded column or special case, values are right justified
+      column->rightJustified = (column->leftPad > column->rightPad);
     }
 
-    printf(headerPrintFormat, column->name);
+    column->end = column->offset + column->length;
   }
+}
 
-  for (columnCount = 0; columns[columnCount].length != -1; columnCount++) {
-    size_t length;
 
-    length = (columns[columnCount].nameLength > columns[columnCount].length)?
-                   columns[columnCount].nameLength : columns[columnCount].length;
-    for (count = 0; count < length; count++) {
-      putchar('-');
-    }
+/**********************************************************************************
+ * Print header
+ * Print width is already max(name length, value length) for each column
+ **********************************************************************************/
+void print_header(struct columnDescription *columns) {
+  struct columnDescription *column;
 
-    if (columns[columnCount+1].length != -1)
-      printf(" ");
+  // Column names
+  for (column = columns; column->length != -1; column++) {
+    printf("%-*.*s%c", (int) column->printWidth, (int) column->nameLength, column->name, column->separator);
   }
 
-  printf("\n");
+  // Underline
+  for (column = columns; column->length != -1; column++) {
+    print_dashes(column->printWidth);
+    putchar(column->separator);
+  }
 }
 
+
 /*************************************************************
  * Flush row
  * Returns current state of processing:
@@ -462,7 +609,7 @@ void process_header(struct columnDescription *columns) {
  *  0  - next line is a common rowset row
  * -1  - rowset processing is completed
  *************************************************************/
-int process_row(struct columnDescription *columns, char *line, int state) {
+static inline int process_row(struct columnDescription *columns, char *line, int state, char *rowBuffer) {
   switch (state) {
     case 1:
       // SQL error or warning processing
@@ -471,25 +618,22 @@ int process_row(struct columnDescription *columns, char *line, int state) {
         state = 0;
       }
 
-      printf("%s\n", line);
-      free(line);
+      print_line(line);
 
       return state;
 
     case 0:
       if ( (state = is_valid_row(columns, line, state)) == 0 ) {
-        print_row(columns, line);
+        print_row(columns, line, rowBuffer);
       } else {
-        printf("%s\n", line);
-        free(line);
+        print_line(line);
       }
 
       return state;
 
     case -1:
       // Non-resultset lines processing
-      printf("%s\n", line);
-      free(line);
+      print_line(line);
 
       return -1;
   }
@@ -503,13 +647,13 @@ int process_row(struct columnDescription *columns, char *line, int state) {
  *  0  - next line is a common rowset row
  * -1  - rowset processing is completed
  *************************************************************/
-int process_rowset_preloaded(struct columnDescription *columns, char **lines) {
+int process_rowset_preloaded(struct columnDescription *columns, char **lines, char *rowBuffer) {
   long count;
   int processing_state = 0;
 
   // Iterate through lines
   for (count = 2; lines[count] != NULL; count++) {
-    processing_state = process_row(columns, lines[count], processing_state);
+    processing_state = process_row(columns, lines[count], processing_state, rowBuffer);
   }
 
   return processing_state;
@@ -524,19 +668,24 @@ int process_rowset_preloaded(struct columnDescription *columns, char **lines) {
  *  0  - next line is a common rowset row
  * -1  - rowset processing is completed
  *************************************************************/
-int process_rowset(struct columnDescription *columns, int processing_state) {
-  char *line;
+int process_rowset(struct columnDescription *columns, int processing_state, char *rowBuffer) {
+  char  *line;
+  char  *buff      = NULL;
+  size_t buff_size = 0;
 
-  while ( (line = getLine(INPUT)) != NULL ) {
-    processing_state = process_row(columns, line, processing_state);
+  while ( (line = readLine(INPUT, &buff, &buff_size)) != NULL ) {
+    processing_state = process_row(columns, line, processing_state, rowBuffer);
   }
 
+  free(buff);
+
   return processing_state;
 }
 
 
 int process_input(int sample_size) {
   char  **inputLines;
+  char   *rowBuffer;
   size_t  headerLength;
   struct columnDescription  *columnsContainer;
 
@@ -575,35 +724,58 @@ int process_input(int sample_size) {
     return 8;
   }
 
-  // Print header
+  // Prepare output format
   process_header(columnsContainer);
-  free(inputLines[0]);
-  free(inputLines[1]);
+
+  // Row buffer is allocated once and reused for every rowset line.
+  // It's done before anything is printed, so input can still be passed through as is.
+  if ((rowBuffer = malloc(get_row_length(columnsContainer))) == NULL) {
+    fprintf(stderr, "Not enough memory or memory allocation error\n");
+
+    free(columnsContainer);
+    flushLines(inputLines);
+    return 9;
+  }
+
+  // Print header
+  print_header(columnsContainer);
 
 
   int processing_state;
 
   // Print preloaded rowset
-  processing_state = process_rowset_preloaded(columnsContainer, inputLines);
+  processing_state = process_rowset_preloaded(columnsContainer, inputLines, rowBuffer);
+  free(inputLines[0]);
   free(inputLines);
 
   // Process the rest of input
-  processing_state = process_rowset(columnsContainer, processing_state);
+  processing_state = process_rowset(columnsContainer, processing_state, rowBuffer);
 
+  free(rowBuffer);
   free(columnsContainer);
 
   return 0;
 }
 
 void print_usage(void) {
-  printf("Usage: format_db2_output [sample_size]\n");
+  printf("Usage: format_db2_output [--line-buffered] [sample_size]\n");
   printf("  format_db2_output takes data from the standard input and prints it to standard output\n");
   printf("  <sample_size> is a number of rows taken to produce output format\n");
   printf("  if <sample_size> is ommitted, then whole row set is used to prepare format\n");
+  printf("  --line-buffered flushes output after each line (interactive use),\n");
+  printf("  otherwise output is written in large blocks\n");
 }
 
 int main(int argc, char *argv[]) {
-  int sample_size = -1;
+  static char outputBuffer[OUTPUT_BUFFER_SIZE];
+  int sample_size   = -1;
+  int line_buffered = 0;
+
+  if (argc > 1 && strcmp(argv[1], "--line-buffered") == 0) {
+    line_buffered = 1;
+    argc--;
+    argv++;
+  }
 
   if (argc == 1) {
     sample_size = -1;
@@ -624,6 +796,10 @@ int main(int argc, char *argv[]) {
     return 3;
   }
 
+  // Output is written in large blocks unless line buffering is requested.
+  // Buffer is passed explicitly, size argument is ignored by glibc otherwise.
+  setvbuf(stdout, outputBuffer, line_buffered ? _IOLBF : _IOFBF, sizeof outputBuffer);
+
   return process_input(sample_size);
 }
 